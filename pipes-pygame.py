@@ -9,10 +9,21 @@ https://www.puzzle-pipes.com
 """
 
 import pygame
-from random import choice, randint
+from random import Random, choice, randint, shuffle, getrandbits
 from time import perf_counter
+from math import ceil, isfinite
 from typing import List, Tuple
 from platform import system
+import sys
+from multiprocessing import Pool, cpu_count
+from zlib import compress, decompress, error as zlib_error
+from array import array
+from collections import deque
+import mmap
+import os
+from tempfile import gettempdir
+import json
+from threading import Thread, Condition
 
 # --- Nodes Management --- #
 # Node Type:
@@ -39,6 +50,16 @@ INVERSE_NODE_ACCESS = (((1,0,0,0), (0,1,0,0), (0,0,1,0), (0,0,0,1)),
 Pos = Tuple[int]
 Matrix = List[list]
 
+# Connection Mask:
+# Bit i is set when the node connects towards POS[i] (up, right, down, left),
+# so rotating a node clockwise rotates its mask one bit to the left.
+def rotate_mask(mask: int, rot: int) -> int:
+    rot %= 4
+    return ((mask << rot) | (mask >> (4 - rot))) & 15
+
+MASK_TYPE_ROT = {sum(bit << i for i, bit in enumerate(aux)): (tp, rot)
+                 for tp, _ in enumerate(INVERSE_NODE_ACCESS) for rot, aux in enumerate(_)}
+
 SYSTEM = system()
 
 class BlankNode:
@@ -82,6 +103,10 @@ def everything_is_connected(mat: Matrix, images_resized: dict) -> bool:
 
 def loops_exist(mat: Matrix, images_resized: dict) -> bool:
     check_connection(mat, images_resized)
+    return water_loops_exist(mat)
+
+def water_loops_exist(mat: Matrix) -> bool:
+    # Uses the water connections of the last check_connection
     for _ in mat:
         for i in _:
             if len(list(filter(lambda x: x, i.water_connections))) > 1:
@@ -95,6 +120,56 @@ def check_victory(mat: Matrix):
                 return False
     return True
 
+# Open Ends:
+# Connections not matched by the neighbouring node (or pointing out of the grid).
+# Boards are spanning trees, so they hold exactly the connections needed to be
+# fully connected and can only be in a victory state with no open ends.
+def open_ends(node) -> int:
+    return ((node.up != node.node_up.down) + (node.right != node.node_right.left)
+            + (node.down != node.node_down.up) + (node.left != node.node_left.right))
+
+def local_open_ends(node) -> int:
+    aux = open_ends(node)
+    for i in (node.node_up, node.node_right, node.node_down, node.node_left):
+        if isinstance(i, Node):
+            aux += open_ends(i)
+    return aux
+
+def count_open_ends(mat: Matrix) -> int:
+    return sum(open_ends(i) for _ in mat for i in _)
+
+def flood_masks(masks, marks, side_length: int, mark: int = 1, offset: int = 0,
+                release = None, release_every: int = 0) -> Tuple[int, int]:
+    # Same water as check_connection over flat connection masks, node (x, y) is
+    # masks[offset + y * side_length + x]. The nodes reached get "mark" set in
+    # marks (same indexes, it may be masks itself) and release is called every
+    # release_every of them. Returns the number of nodes reached and of the
+    # connections between them.
+    offsets = (-side_length, 1, side_length, -1)
+    end = offset + side_length ** 2
+    center = offset + side_length // 2 * (side_length + 1)
+    marks[center] |= mark
+    queue = deque([center])
+    reached = 1
+    connections = 0
+    while queue:
+        i = queue.popleft()
+        x = (i - offset) % side_length
+        for d in range(4):
+            if not masks[i] & (1 << d) or d == 1 and x == side_length - 1 or d == 3 and x == 0:
+                continue
+            j = i + offsets[d]
+            if not offset <= j < end or not masks[j] & (1 << (d + 2) % 4):
+                continue
+            connections += 1
+            if not marks[j] & mark:
+                marks[j] |= mark
+                reached += 1
+                queue.append(j)
+                if release is not None and reached % release_every == 0:
+                    release()
+    return reached, connections // 2
+
 class Node:
     def __init__(self, pos: Pos, rot: int, n_type: int, images_resized: dict):
         self.pos = pos
@@ -105,8 +180,8 @@ class Node:
         self.image = image_getter(self.type, self.with_water, images_resized)
         self.update_rot()
     
-    def copy(self):
-        return Node(self.pos, self.rot, self.type)
+    def copy(self, images_resized: dict):
+        return Node(self.pos, self.rot, self.type, images_resized)
     
     def update_rot(self):
         aux1 = [True]
@@ -126,13 +201,16 @@ class Node:
     def update_image(self, images_resized: dict):
         self.image = image_getter(self.type, self.with_water, images_resized)
     
-    def click(self, mat: Matrix, clockwise: bool, images_resized: dict):
+    def rotate(self, clockwise: bool):
         if clockwise:
             self.up, self.right, self.down, self.left = self.left, self.up, self.right, self.down
             self.rot = (self.rot + 1) % 4
         else:
             self.up, self.right, self.down, self.left = self.right, self.down, self.left, self.up
             self.rot = (self.rot - 1) % 4
+    
+    def click(self, mat: Matrix, clockwise: bool, images_resized: dict):
+        self.rotate(clockwise)
         edges = check_connection(mat, images_resized)
         return edges, check_victory(mat)
         
@@ -206,6 +284,122 @@ def check_connection(mat: Matrix, images_resized: dict) -> list:
     clear_checks(mat)
     return edges
 
+# --- Progressive Water --- #
+# check_connection split in steps so big boards don't freeze a frame. It is a
+# generator that yields every WATER_STEP nodes, run_water_propagation resumes it
+# until the frame budget is spent. The water spreads in breadth first order and
+# a node gets it as soon as it is reached, which gives the same water and the
+# same loops as check_connection.
+WATER_STEP = 256
+WATER_FRAME_BUDGET = 0.008
+
+def propagate_water(mat: Matrix, images_resized: dict):
+    for n, _ in enumerate(mat):
+        for i in _:
+            i.with_water = i.type >= 5
+            i.water_connections = []
+            i.checked = False
+            i.update_image(images_resized)
+        if n % max(1, WATER_STEP // len(mat)) == 0:
+            yield
+    x = len(mat) // 2
+    mat[x][x].with_water = True
+    mat[x][x].checked = True
+    queue = deque([mat[x][x]])
+    visited = []
+    while queue:
+        node = queue.popleft()
+        visited.append(node)
+        neighbours = (node.node_up, node.node_right, node.node_down, node.node_left)
+        connections = (node.up and node.node_up.down, node.right and node.node_right.left,
+                       node.down and node.node_down.up, node.left and node.node_left.right)
+        node.water_connections = [con and i.with_water for con, i in zip(connections, neighbours)]
+        for con, i in zip(connections, neighbours):
+            if con and not i.checked:
+                i.checked = True
+                i.with_water = True
+                queue.append(i)
+        node.update_image(images_resized)
+        if len(visited) % WATER_STEP == 0:
+            yield
+    for n, i in enumerate(visited):
+        i.checked = False
+        if n % WATER_STEP == 0:
+            yield
+
+def run_water_propagation(propagation, budget: float = WATER_FRAME_BUDGET) -> bool:
+    # Returns True once the propagation is over
+    end = perf_counter() + budget
+    for _ in propagation:
+        if perf_counter() >= end:
+            return False
+    return True
+
+# --- Move Journal --- #
+# Moves are stored as "cell << 1 | clockwise" with "cell = y * side_length + x".
+# Every JOURNAL_CHECKPOINT_EVERY moves the rotations of the whole board are
+# saved compressed, so any point of the history can be reached by restoring the
+# closest checkpoint and replaying the moves after it.
+JOURNAL_CHECKPOINT_EVERY = 500
+
+def board_checkpoint(mat: Matrix) -> bytes:
+    return compress(bytes(i.rot % 4 for _ in mat for i in _), 1)
+
+def restore_checkpoint(mat: Matrix, checkpoint: bytes):
+    rots = decompress(checkpoint)
+    side_length = len(mat)
+    for y, _ in enumerate(mat):
+        for x, i in enumerate(_):
+            rot = rots[y * side_length + x]
+            if i.rot % 4 != rot:
+                i.rot = rot
+                i.update_rot()
+
+class MoveJournal:
+    def __init__(self, mat: Matrix, checkpoint_every: int = JOURNAL_CHECKPOINT_EVERY):
+        self.side_length = len(mat)
+        self.checkpoint_every = checkpoint_every
+        self.moves = array("l")
+        self.position = 0
+        self.checkpoints = [board_checkpoint(mat)]
+    
+    def record(self, mat: Matrix, pos: Pos, clockwise: bool):
+        # Called after the move was made, drops the moves that were undone
+        del self.moves[self.position:]
+        del self.checkpoints[self.position // self.checkpoint_every + 1:]
+        self.moves.append((pos[1] * self.side_length + pos[0]) << 1 | clockwise)
+        self.position += 1
+        if self.position % self.checkpoint_every == 0:
+            self.checkpoints.append(board_checkpoint(mat))
+    
+    def move_at(self, index: int) -> Tuple[Pos, bool]:
+        cell, clockwise = divmod(self.moves[index], 2)
+        return (cell % self.side_length, cell // self.side_length), bool(clockwise)
+    
+    def undo(self):
+        # Returns the move that undoes the last one (None if there is none)
+        if not self.position:
+            return None
+        self.position -= 1
+        pos, clockwise = self.move_at(self.position)
+        return pos, not clockwise
+    
+    def redo(self):
+        if self.position == len(self.moves):
+            return None
+        self.position += 1
+        return self.move_at(self.position - 1)
+    
+    def jump(self, mat: Matrix, position: int):
+        position = max(0, min(position, len(self.moves)))
+        checkpoint = position // self.checkpoint_every
+        if abs(position - self.position) > position - checkpoint * self.checkpoint_every:
+            restore_checkpoint(mat, self.checkpoints[checkpoint])
+            self.position = checkpoint * self.checkpoint_every
+        while self.position != position:
+            move = self.redo() if self.position < position else self.undo()
+            mat[move[0][1]][move[0][0]].rotate(move[1])
+
 # --- Image Management Functions --- #
 
 # Pipes Images
@@ -260,6 +454,26 @@ def resize_images(side: int, images: dict):
     return aux_dict
 
 # Colors
+IMAGE_COLOR_THEMES = {"default": ((100,180,230), # Light Blue (Water)
+                                  (60,60,150), # Dark blue (Center Node)
+                                  (80,160,200)), # Receiver Node
+                      "red": ((170,15,15),
+                              (100, 5, 5),
+                              (170,60,60)),
+                      "green": ((15,170,15),
+                                (5, 90, 5),
+                                (70,190,70)),
+                      "yellow": ((200,200,20),
+                                 (160,160,0),
+                                 (240,240,70)),
+                      "white": ((220,220,220),
+                                (180,180,180),
+                                (255,255,255)),
+                      "black": ((30,30,30),
+                                (0,0,0),
+                                (55,55,55))
+                      }
+
 def change_theme(curr: str, new: str, images: dict, image_color_themes: dict):
     translation = (image_color_themes[curr], image_color_themes[new])
     start = ["Receiver_Node", "Straight_Tube", "Two_Way_Tube", "Three_Way_Tube", "Four_Way_Tube"]
@@ -299,6 +513,17 @@ def resize_icons(size: int, icons: dict) -> dict:
         aux[i] = pygame.transform.scale(item, (size, size))
     return aux
     
+# --- Layer Functions --- #
+def render_grid_layer(grid_size: int, step: int, back_color, back_alpha: int, lines_color, is_grid_on: bool):
+    layer = pygame.Surface((grid_size + 1, grid_size + 1), pygame.SRCALPHA)
+    layer.fill((back_color[0], back_color[1], back_color[2], back_alpha), pygame.Rect(0, 0, grid_size, grid_size))
+    if is_grid_on:
+        for x in range(0, grid_size + 1, step):
+            pygame.draw.line(layer, lines_color, (x, 0), (x, grid_size))
+        for y in range(0, grid_size + 1, step):
+            pygame.draw.line(layer, lines_color, (0, y), (grid_size, y))
+    return layer
+
 # --- Grid Functions --- #
 def scrabble_matrix(mat: Matrix):
     for _ in mat:
@@ -306,7 +531,717 @@ def scrabble_matrix(mat: Matrix):
             i.rot = randint(0, 4)
             i.update_rot()
 
-# Main Grid Generator Fuction in main()
+# --- Main Grid Generator Function --- #
+def get_tubulation(side_length: int, images_resized: dict, progress = None) -> Matrix:
+    center_node_pos = (side_length // 2, side_length // 2)
+    matrix = []
+    for row in range(side_length):
+        aux = []
+        for col in range(side_length):
+            if (row, col) != center_node_pos:
+                tp = 4
+                rot = 0
+                if row == 0 or row == side_length - 1:
+                    tp -= 1
+                if col == 0 or col == side_length - 1:
+                    tp -= 1
+                if row == 0 and 0 <= col < side_length - 1:
+                    rot = 1
+                elif col == side_length - 1 and 0 <= row < side_length - 1:
+                    rot = 2
+                elif row == side_length - 1 and 0 < col < side_length:
+                    rot = 3
+                aux.append(Node((col, row), rot, tp, images_resized))
+            else:
+                aux.append(Node(center_node_pos, 0, 9, images_resized))
+        matrix.append(aux)
+    for _ in matrix:
+        for i in _:
+            i.def_surrounding_nodes(matrix)
+    horizontal_edges = [((i, j), (i, j + 1)) for i in range(side_length) for j in range(side_length - 1)]
+    vertical_edges = [((i, j), (i + 1, j)) for i in range(side_length - 1) for j in range(side_length)]
+    edges = horizontal_edges + vertical_edges
+    edges_total_len = len(edges)
+    exited = False
+    while loops_exist(matrix, images_resized):
+        while everything_is_connected(matrix, images_resized):
+            edge = choice(edges)
+            pos1, pos2 = edge
+            direction = (pos1[0] - pos2[0], pos1[1] - pos2[1])
+            node1 = matrix[pos1[1]][pos1[0]]
+            node2 = matrix[pos2[1]][pos2[0]]
+            if direction == (0, -1):
+                node1.down = False
+                node2.up = False
+            elif direction == (-1, 0):
+                node1.right = False
+                node2.left = False
+            edges.remove(edge)
+
+            # Loading Bar
+            if progress is not None:
+                progress(edges_total_len - len(edges), edges_total_len)
+
+            exited = True
+        if exited:
+            exited = False
+            if direction == (0, -1):
+                node1.down = True
+                node2.up = True
+            elif direction == (-1, 0):
+                node1.right = True
+                node2.left = True
+    for _ in matrix:
+        for i in _:
+            i.def_type_rot_image(images_resized)
+
+    return matrix
+
+# --- Unique Grid Generator Functions --- #
+# Cells are indexed by "row * side_length + col" and every cell is described
+# by its connection mask (see Mask Functions). A board is generated as a random
+# spanning tree and then checked by propagating the rotation candidates of every
+# cell. While more than one solution exists the tree is rerouted around one of
+# the ambiguous cells and checked again.
+UNIQUE_SEARCH_BUDGET = 2000
+
+def get_neighbours(side_length: int) -> List[tuple]:
+    aux = []
+    for row in range(side_length):
+        for col in range(side_length):
+            neighbours = []
+            for i in POS:
+                pos = (col + i[0], row + i[1])
+                if 0 <= pos[0] < side_length and 0 <= pos[1] < side_length:
+                    neighbours.append(pos[1] * side_length + pos[0])
+                else:
+                    neighbours.append(-1)
+            aux.append(tuple(neighbours))
+    return aux
+
+def find_root(parent: list, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def random_tree_masks(side_length: int) -> list:
+    # Same randomized Kruskal as the tiles of the tiled generator
+    return list(random_tree_block(side_length, side_length, getrandbits(32)))
+
+def propagate_candidates(cand: list, neighbours: List[tuple], queue: set) -> bool:
+    # Both sides of an edge must agree on it being open or closed
+    while queue:
+        i = queue.pop()
+        for d in range(4):
+            j = neighbours[i][d]
+            if j < 0:
+                continue
+            bit = 1 << d
+            has_bit = any(m & bit for m in cand[i])
+            if has_bit and not all(m & bit for m in cand[i]):
+                continue
+            opposite_bit = 1 << (d + 2) % 4
+            aux = [m for m in cand[j] if bool(m & opposite_bit) == has_bit]
+            if len(aux) != len(cand[j]):
+                if not aux:
+                    return False
+                cand[j] = aux
+                queue.add(j)
+    return True
+
+def prune_candidates(cand: list, neighbours: List[tuple]):
+    # Removes candidates that would close a loop or an island.
+    # Returns None on a contradiction or the set of changed cells.
+    n_cells = len(cand)
+    parent = list(range(n_cells))
+    for i in range(n_cells):
+        for d in (1, 2):
+            j = neighbours[i][d]
+            if j >= 0 and all(m & (1 << d) for m in cand[i]):
+                root_i, root_j = find_root(parent, i), find_root(parent, j)
+                if root_i == root_j:
+                    return None
+                parent[root_i] = root_j
+    open_ends = [0] * n_cells
+    sizes = [0] * n_cells
+    undecided = []
+    for i in range(n_cells):
+        root_i = find_root(parent, i)
+        sizes[root_i] += 1
+        for d in range(4):
+            j = neighbours[i][d]
+            bit = 1 << d
+            if j >= 0 and any(m & bit for m in cand[i]) and not all(m & bit for m in cand[i]):
+                open_ends[root_i] += 1
+                if d in (1, 2):
+                    undecided.append((i, d, j))
+    for root_i in range(n_cells):
+        if sizes[root_i] and not open_ends[root_i] and sizes[root_i] < n_cells:
+            return None
+    changed = set()
+    for i, d, j in undecided:
+        root_i, root_j = find_root(parent, i), find_root(parent, j)
+        closes_loop = root_i == root_j
+        closes_island = (open_ends[root_i] == 1 and open_ends[root_j] == 1
+                         and sizes[root_i] + sizes[root_j] < n_cells)
+        dead_ends = all(m in (1, 2, 4, 8) for m in cand[i] + cand[j])
+        if closes_loop or closes_island or dead_ends:
+            cand[i] = [m for m in cand[i] if not m & (1 << d)]
+            cand[j] = [m for m in cand[j] if not m & (1 << (d + 2) % 4)]
+            if not cand[i] or not cand[j]:
+                return None
+            changed.update((i, j))
+    return changed
+
+def reduce_candidates(cand: list, neighbours: List[tuple], queue: set) -> bool:
+    while True:
+        if not propagate_candidates(cand, neighbours, queue):
+            return False
+        queue = prune_candidates(cand, neighbours)
+        if queue is None:
+            return False
+        if not queue:
+            return True
+
+def solve_masks(masks: list, neighbours: List[tuple], limit: int = 2, budget: int = UNIQUE_SEARCH_BUDGET):
+    # Returns the solutions found (at most limit) and the ambiguous cells:
+    # the cells where two solutions differ or, if the search ran out of budget,
+    # the cells that propagation alone could not decide.
+    cand = []
+    for i, mask in enumerate(masks):
+        aux = []
+        for rot in range(4):
+            m = rotate_mask(mask, rot)
+            if m not in aux and all(neighbours[i][d] >= 0 for d in range(4) if m & (1 << d)):
+                aux.append(m)
+        cand.append(aux)
+    if not reduce_candidates(cand, neighbours, set(range(len(cand)))):
+        return [], []
+    undecided = [i for i, aux in enumerate(cand) if len(aux) > 1]
+    solutions = []
+    steps = [budget]
+
+    def search(cand: list):
+        if len(solutions) >= limit or steps[0] <= 0:
+            return
+        steps[0] -= 1
+        cells = [i for i, aux in enumerate(cand) if len(aux) > 1]
+        if not cells:
+            solutions.append([aux[0] for aux in cand])
+            return
+        i = min(cells, key = lambda x: len(cand[x]))
+        for m in cand[i]:
+            aux = [list(_) for _ in cand]
+            aux[i] = [m]
+            if reduce_candidates(aux, neighbours, {i}):
+                search(aux)
+
+    search(cand)
+    if len(solutions) > 1:
+        return solutions, [i for i in undecided if solutions[0][i] != solutions[1][i]]
+    if steps[0] <= 0:
+        return solutions, undecided
+    return solutions, []
+
+def tree_path(masks: list, neighbours: List[tuple], start: int, end: int) -> list:
+    previous = {start: start}
+    queue = [start]
+    for i in queue:
+        if i == end:
+            break
+        for d in range(4):
+            j = neighbours[i][d]
+            if masks[i] & (1 << d) and j not in previous:
+                previous[j] = i
+                queue.append(j)
+    path = [end]
+    while path[-1] != start:
+        path.append(previous[path[-1]])
+    return path[::-1]
+
+def reroute_tree(masks: list, neighbours: List[tuple], cell: int):
+    # Adds a missing edge next to cell and removes another one from the loop it
+    # creates, as close to cell as possible, so the tree only changes locally.
+    directions = [d for d in range(4) if neighbours[cell][d] >= 0 and not masks[cell] & (1 << d)]
+    while not directions:
+        cell = neighbours[cell][choice([d for d in range(4) if neighbours[cell][d] >= 0])]
+        directions = [d for d in range(4) if neighbours[cell][d] >= 0 and not masks[cell] & (1 << d)]
+    d = choice(directions)
+    j = neighbours[cell][d]
+    path = tree_path(masks, neighbours, cell, j)
+    path_edges = list(zip(path, path[1:]))
+    a, b = choice(path_edges[:2] + path_edges[-2:])
+    for x, y in ((a, b), (b, a)):
+        masks[x] &= ~(1 << neighbours[x].index(y))
+    masks[cell] |= 1 << d
+    masks[j] |= 1 << (d + 2) % 4
+
+def unique_tubulation_masks(side_length: int, progress = None) -> list:
+    neighbours = get_neighbours(side_length)
+    masks = random_tree_masks(side_length)
+    n_cells = side_length ** 2
+    while True:
+        solutions, ambiguous = solve_masks(masks, neighbours)
+        if len(solutions) == 1 and not ambiguous:
+            return masks
+        if progress is not None:
+            progress(n_cells - len(ambiguous), n_cells)
+        reroute_tree(masks, neighbours, choice(ambiguous))
+
+def nodes_from_masks(masks: list, side_length: int, images_resized: dict) -> Matrix:
+    center = side_length // 2
+    matrix = []
+    for row in range(side_length):
+        aux = []
+        for col in range(side_length):
+            tp, rot = MASK_TYPE_ROT[masks[row * side_length + col]]
+            if (col, row) == (center, center):
+                tp += 5
+            aux.append(Node((col, row), rot, tp, images_resized))
+        matrix.append(aux)
+    for _ in matrix:
+        for i in _:
+            i.def_surrounding_nodes(matrix)
+    return matrix
+
+def get_unique_tubulation(side_length: int, images_resized: dict, progress = None) -> Matrix:
+    masks = unique_tubulation_masks(side_length, progress)
+    return nodes_from_masks(masks, side_length, images_resized)
+
+# --- Tiled Grid Generator Functions --- #
+# Very large boards are split into blocks. Each block gets its own random
+# spanning tree in a worker process and the blocks are then stitched together
+# by a random spanning tree over the blocks, opening one random edge on the
+# border of every pair of blocks it joins. The masks are kept in a bytearray.
+TILE_SIZE = 250
+
+def random_tree_block(width: int, height: int, seed: int) -> bytes:
+    # Randomized Kruskal over the edges of a width x height block
+    rng = Random(seed)
+    # Edge "i << 1" joins i to its right, edge "i << 1 | 1" joins i to its bottom
+    edges = [i << 1 for i in range(width * height) if i % width < width - 1]
+    edges += [i << 1 | 1 for i in range(width * (height - 1))]
+    rng.shuffle(edges)
+    parent = list(range(width * height))
+    masks = bytearray(width * height)
+    for edge in edges:
+        i = edge >> 1
+        if edge & 1:
+            j, bit_i, bit_j = i + width, 4, 1
+        else:
+            j, bit_i, bit_j = i + 1, 2, 8
+        root_i, root_j = find_root(parent, i), find_root(parent, j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+            masks[i] |= bit_i
+            masks[j] |= bit_j
+    return bytes(masks)
+
+def random_tree_block_task(task: tuple) -> tuple:
+    index, width, height, seed = task
+    return index, random_tree_block(width, height, seed)
+
+def tiled_tubulation_masks(side_length: int, processes: int = None, tile_size: int = TILE_SIZE) -> bytearray:
+    bounds = list(range(0, side_length, tile_size)) + [side_length]
+    tiles_side = len(bounds) - 1
+    tasks = [(ty * tiles_side + tx, bounds[tx + 1] - bounds[tx], bounds[ty + 1] - bounds[ty], randint(0, 2 ** 32))
+             for ty in range(tiles_side) for tx in range(tiles_side)]
+    if processes == 1:
+        results = list(map(random_tree_block_task, tasks))
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(random_tree_block_task, tasks)
+    masks = bytearray(side_length ** 2)
+    for index, block in results:
+        ty, tx = divmod(index, tiles_side)
+        width = bounds[tx + 1] - bounds[tx]
+        for row in range(bounds[ty + 1] - bounds[ty]):
+            start = (bounds[ty] + row) * side_length + bounds[tx]
+            masks[start:start + width] = block[row * width:(row + 1) * width]
+
+    # Stitching
+    edges = [(i, 1) for i in range(tiles_side ** 2) if i % tiles_side < tiles_side - 1]
+    edges += [(i, 2) for i in range(tiles_side * (tiles_side - 1))]
+    shuffle(edges)
+    parent = list(range(tiles_side ** 2))
+    for index, d in edges:
+        other = index + 1 if d == 1 else index + tiles_side
+        root_i, root_j = find_root(parent, index), find_root(parent, other)
+        if root_i == root_j:
+            continue
+        parent[root_i] = root_j
+        ty, tx = divmod(index, tiles_side)
+        if d == 1:
+            row, col = randint(bounds[ty], bounds[ty + 1] - 1), bounds[tx + 1] - 1
+            masks[row * side_length + col] |= 2
+            masks[row * side_length + col + 1] |= 8
+        else:
+            row, col = bounds[ty + 1] - 1, randint(bounds[tx], bounds[tx + 1] - 1)
+            masks[row * side_length + col] |= 4
+            masks[(row + 1) * side_length + col] |= 1
+    return masks
+
+def masks_form_tree(masks, side_length: int) -> bool:
+    # Every connection must be matched by its neighbour, and all the nodes must
+    # be reached from the center through exactly side_length ** 2 - 1 edges.
+    n_connections = 0
+    for i in range(side_length ** 2):
+        row, col = divmod(i, side_length)
+        mask = masks[i]
+        for d, j, inside in ((0, i - side_length, row > 0), (1, i + 1, col < side_length - 1),
+                             (2, i + side_length, row < side_length - 1), (3, i - 1, col > 0)):
+            if mask & (1 << d):
+                if not inside or not masks[j] & (1 << (d + 2) % 4):
+                    return False
+                n_connections += 1
+    # Every edge was counted from both of its ends
+    if n_connections // 2 != side_length ** 2 - 1:
+        return False
+    reached, _ = flood_masks(masks, bytearray(side_length ** 2), side_length)
+    return reached == side_length ** 2
+
+def get_tiled_tubulation(side_length: int, images_resized: dict, processes: int = None) -> Matrix:
+    masks = tiled_tubulation_masks(side_length, processes)
+    return nodes_from_masks(masks, side_length, images_resized)
+
+# --- Memory-Mapped Boards --- #
+# File: "PIPE", side_length (4 bytes, little endian) and then one byte per node,
+# row after row, with the connection mask in the low 4 bits and the water in
+# WATER_BIT. Only the pages in use are loaded, and they are released every
+# MAPPED_RELEASE_EVERY rows or nodes so the resident memory stays bounded.
+MAPPED_BOARD_MAGIC = b"PIPE"
+MAPPED_BOARD_HEADER_SIZE = 8
+MAPPED_RELEASE_EVERY = 1 << 16
+WATER_BIT = 16
+
+class MappedBoard:
+    def __init__(self, path: str, side_length: int = None):
+        # Creates the file when side_length is given, opens it otherwise
+        if side_length is not None:
+            with open(path, "wb") as file:
+                file.write(MAPPED_BOARD_MAGIC + side_length.to_bytes(4, "little"))
+                file.truncate(MAPPED_BOARD_HEADER_SIZE + side_length ** 2)
+        self.file = open(path, "r+b")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        except (ValueError, OSError): # Empty file
+            self.file.close()
+            raise
+        self.side_length = int.from_bytes(self.map[4:8], "little")
+        if self.map[:4] != MAPPED_BOARD_MAGIC or len(self.map) != MAPPED_BOARD_HEADER_SIZE + self.side_length ** 2:
+            self.close()
+            raise ValueError(f"{path} is not a board file")
+
+    def index(self, x: int, y: int) -> int:
+        return MAPPED_BOARD_HEADER_SIZE + y * self.side_length + x
+
+    def row(self, y: int) -> bytes:
+        start = self.index(0, y)
+        return self.map[start:start + self.side_length]
+
+    def set_row(self, y: int, row: bytes):
+        start = self.index(0, y)
+        self.map[start:start + self.side_length] = row
+
+    def window(self, x: int, y: int, width: int, height: int) -> List[bytes]:
+        # Rows of the visible part of the board, the rest is never paged in
+        return [self.map[self.index(x, row):self.index(x, row) + width] for row in range(y, y + height)]
+
+    def mask(self, x: int, y: int) -> int:
+        return self.map[self.index(x, y)] & 15
+
+    def with_water(self, x: int, y: int) -> bool:
+        return bool(self.map[self.index(x, y)] & WATER_BIT)
+
+    def rotate(self, x: int, y: int, clockwise: bool):
+        i = self.index(x, y)
+        self.map[i] = self.map[i] & WATER_BIT | rotate_mask(self.map[i] & 15, 1 if clockwise else 3)
+
+    def release(self):
+        self.map.flush()
+        if hasattr(mmap, "MADV_DONTNEED"):
+            self.map.madvise(mmap.MADV_DONTNEED)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+ROTATED_MASKS = tuple(tuple(rotate_mask(mask, rot) for rot in range(4)) for mask in range(16))
+
+def scramble_masks(row) -> bytes:
+    # Random rotation of every mask, two random bits per mask
+    bits = getrandbits(2 * len(row) or 1)
+    return bytes(ROTATED_MASKS[mask][bits >> 2 * x & 3] for x, mask in enumerate(row))
+
+def generate_mapped_board(path: str, side_length: int, scrambled: bool = True) -> MappedBoard:
+    # Eller's algorithm, the spanning tree is built one row at a time and then
+    # scrambled like scrabble_matrix before being written
+    board = MappedBoard(path, side_length)
+    release_rows = max(1, MAPPED_RELEASE_EVERY // side_length)
+    labels = list(range(side_length))
+    next_label = side_length
+    row = bytearray(side_length)
+    for y in range(side_length):
+        last_row = y == side_length - 1
+        parent = {i: i for i in labels}
+        for x in range(side_length - 1):
+            root_a, root_b = find_root(parent, labels[x]), find_root(parent, labels[x + 1])
+            if root_a != root_b and (last_row or randint(0, 1)):
+                parent[root_a] = root_b
+                row[x] |= 2
+                row[x + 1] |= 8
+        labels = [find_root(parent, i) for i in labels]
+        next_row = bytearray(side_length)
+        if not last_row:
+            sets = {}
+            for x, i in enumerate(labels):
+                sets.setdefault(i, []).append(x)
+            next_labels = [-1] * side_length
+            for i, cells in sets.items():
+                down = [x for x in cells if randint(0, 1)] or [choice(cells)]
+                for x in down:
+                    row[x] |= 4
+                    next_row[x] |= 1
+                    next_labels[x] = i
+            for x in range(side_length):
+                if next_labels[x] < 0:
+                    next_labels[x] = next_label
+                    next_label += 1
+            labels = next_labels
+        if scrambled:
+            row = scramble_masks(row)
+        board.set_row(y, row)
+        row = next_row
+        if y % release_rows == 0:
+            board.release()
+    board.release()
+    return board
+
+def mapped_board_from_masks(path: str, masks, side_length: int, scrambled: bool = False) -> MappedBoard:
+    # Writes a board given by its connection masks (from the generators or a game)
+    board = MappedBoard(path, side_length)
+    release_rows = max(1, MAPPED_RELEASE_EVERY // side_length)
+    for y in range(side_length):
+        row = masks[y * side_length:(y + 1) * side_length]
+        if scrambled:
+            row = scramble_masks(row)
+        board.set_row(y, bytes(row))
+        if y % release_rows == 0:
+            board.release()
+    board.release()
+    return board
+
+def mapped_check_connection(board: MappedBoard) -> Tuple[int, bool]:
+    # Same water as check_connection, the water bits double as visited marks.
+    # Returns the number of nodes with water and if they hold a loop.
+    side_length = board.side_length
+    release_rows = max(1, MAPPED_RELEASE_EVERY // side_length)
+    for y in range(side_length):
+        board.set_row(y, bytes(i & 15 for i in board.row(y)))
+        if y % release_rows == 0:
+            board.release()
+    watered, connections = flood_masks(board.map, board.map, side_length, WATER_BIT, MAPPED_BOARD_HEADER_SIZE,
+                                       board.release, MAPPED_RELEASE_EVERY)
+    board.release()
+    return watered, connections > watered - 1
+
+# --- Autosave --- #
+# File: "PSAV", size of the info (4 bytes, little endian), the info as JSON
+# (side length, elapsed time and settings) and then the board compressed, one
+# byte per node with the type in the low 4 bits and the rotation above it.
+# The file is written next to it and then replaced, so it is never left half written.
+AUTOSAVE_PATH = "autosave.pipes"
+AUTOSAVE_MAGIC = b"PSAV"
+AUTOSAVE_INFO_TYPES = {"size": int, "elapsed": (int, float), "language": str, "theme": str,
+                       "timer_back": bool, "grid": bool, "unique": bool}
+
+def board_snapshot(mat: Matrix) -> bytes:
+    # Taken on the main thread, so the board always matches the info saved with it
+    return bytes(i.type | i.rot % 4 << 4 for _ in mat for i in _)
+
+def save_game(path: str, board: bytes, info: dict):
+    data = json.dumps(info).encode()
+    with open(path + ".tmp", "wb") as file:
+        file.write(AUTOSAVE_MAGIC + len(data).to_bytes(4, "little") + data + compress(board, 1))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+def load_game(path: str, languages, size_bounds: Tuple[int]) -> Tuple[dict, bytes]:
+    with open(path, "rb") as file:
+        content = file.read()
+    if content[:4] != AUTOSAVE_MAGIC:
+        raise ValueError(f"{path} is not a save file")
+    size = int.from_bytes(content[4:8], "little")
+    try:
+        info = json.loads(content[8:8 + size])
+        board = decompress(content[8 + size:])
+        side_length, elapsed = info["size"], info["elapsed"]
+        center = side_length // 2 * (side_length + 1)
+        # Rotations below 4, node types below 10 and the source (type 5 or more) only at the center
+        is_valid = (all(isinstance(info[key], types) for key, types in AUTOSAVE_INFO_TYPES.items())
+                    and not isinstance(side_length, bool) and not isinstance(elapsed, bool)
+                    and size_bounds[0] <= side_length <= size_bounds[1] and isfinite(elapsed) and elapsed >= 0
+                    and info["language"] in languages and info["theme"] in IMAGE_COLOR_THEMES
+                    and len(board) == side_length ** 2
+                    and all(i < 64 and i & 15 < 10 and (i & 15 >= 5) == (n == center) for n, i in enumerate(board)))
+    except (zlib_error, KeyError, TypeError):
+        is_valid = False
+    if not is_valid:
+        raise ValueError(f"{path} is not a save file")
+    return info, board
+
+def nodes_from_save(board: bytes, side_length: int, images_resized: dict) -> Matrix:
+    matrix = [[Node((col, row), board[row * side_length + col] >> 4, board[row * side_length + col] & 15, images_resized)
+               for col in range(side_length)] for row in range(side_length)]
+    for _ in matrix:
+        for i in _:
+            i.def_surrounding_nodes(matrix)
+    return matrix
+
+class Autosaver:
+    # Saves on a background thread, only the newest request waiting is kept
+    def __init__(self, path: str = AUTOSAVE_PATH):
+        self.path = path
+        self.request = None
+        self.running = True
+        self.condition = Condition()
+        self.thread = Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def save(self, board: bytes, info: dict):
+        with self.condition:
+            self.request = (board, info)
+            self.condition.notify()
+
+    def clear(self):
+        with self.condition:
+            self.request = ()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None and self.running:
+                    self.condition.wait()
+                request, self.request = self.request, None
+            if request is None:
+                return
+            try:
+                if request:
+                    save_game(self.path, *request)
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+            except OSError:
+                pass # The game goes on without the autosave
+
+    def close(self):
+        # Waits for the last request to be written
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+# --- Thumbnail Rendering --- #
+# Boards are drawn without a window straight from their connection masks. The
+# sprites are rotated and scaled once per tile size, and then every board is a
+# single Surface.blits call instead of a transform.rotate and a blit per node.
+THUMBNAIL_SIZE = 128
+THUMBNAIL_BACK_COLOR = (64, 64, 64)
+thumbnail_images = None # Sprites of the worker, see thumbnail_worker_init
+thumbnail_tiles_cache = {}
+
+def masks_from_save(board: bytes) -> list:
+    # Connection masks of the board of a save file (see save_game)
+    return [rotate_mask(sum(1 << d for d in (0,) + NODE_ACCESS[(i & 15) % 5]), i >> 4) for i in board]
+
+def masks_water(masks, side_length: int) -> bytearray:
+    water = bytearray(side_length ** 2)
+    flood_masks(masks, water, side_length)
+    return water
+
+def thumbnail_tiles(tile_size: int, images: dict, smooth: bool = True) -> dict:
+    # (mask, with_water, is_source) -> sprite already rotated and scaled. Not
+    # smooth, the sprites are scaled like resize_images does for the game.
+    scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+    tiles = {}
+    for mask, (tp, rot) in MASK_TYPE_ROT.items():
+        for water in (False, True):
+            for source in (False, True):
+                image = scale(image_getter(tp + 5 * source, water, images), (tile_size, tile_size))
+                tiles[mask, water, source] = pygame.transform.rotate(image, - 90 * rot)
+    return tiles
+
+def render_thumbnail(masks, side_length: int, size: int, images: dict, tiles_cache: dict,
+                     back_color = THUMBNAIL_BACK_COLOR, smooth: bool = True,
+                     water = None, source: int = None) -> pygame.Surface:
+    # The water is found from the masks and the source is at the center,
+    # unless they are given (water per node and the index of the source, -1 for none)
+    tile_size = max(1, size // side_length)
+    if (tile_size, smooth) not in tiles_cache:
+        tiles_cache[tile_size, smooth] = thumbnail_tiles(tile_size, images, smooth)
+    tiles = tiles_cache[tile_size, smooth]
+    if water is None:
+        water = masks_water(masks, side_length)
+    if source is None:
+        source = side_length // 2 * (side_length + 1)
+    surface = pygame.Surface((side_length * tile_size, side_length * tile_size))
+    surface.fill(back_color)
+    surface.blits([(tiles[masks[i], water[i], i == source], (i % side_length * tile_size, i // side_length * tile_size))
+                   for i in range(side_length ** 2) if masks[i]], False)
+    if surface.get_width() != size:
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        surface = scale(surface, (size, size))
+    return surface
+
+def render_mapped_window(board: MappedBoard, x: int, y: int, side_length: int, size: int, images: dict,
+                         tiles_cache: dict, back_color = THUMBNAIL_BACK_COLOR, smooth: bool = True) -> pygame.Surface:
+    # Draws the side_length x side_length nodes from (x, y) of a memory-mapped
+    # board, only their rows are paged in. The water is the one stored in the
+    # file by mapped_check_connection.
+    side_length = min(side_length, board.side_length)
+    x = min(max(0, x), board.side_length - side_length)
+    y = min(max(0, y), board.side_length - side_length)
+    data = b"".join(board.window(x, y, side_length, side_length))
+    center = board.side_length // 2
+    source = -1
+    if x <= center < x + side_length and y <= center < y + side_length:
+        source = (center - y) * side_length + center - x
+    return render_thumbnail(bytes(i & 15 for i in data), side_length, size, images, tiles_cache, back_color, smooth,
+                            bytes(i & WATER_BIT > 0 for i in data), source)
+
+def thumbnail_worker_init(theme: str):
+    global thumbnail_images
+    thumbnail_images = get_images()
+    if theme != "default":
+        change_theme("default", theme, thumbnail_images, IMAGE_COLOR_THEMES)
+    thumbnail_tiles_cache.clear()
+
+def render_thumbnail_task(task: tuple):
+    masks, side_length, size, smooth, path = task
+    surface = render_thumbnail(masks, side_length, size, thumbnail_images, thumbnail_tiles_cache, smooth = smooth)
+    if path is None:
+        return pygame.image.tobytes(surface, "RGB")
+    pygame.image.save(surface, path)
+    return path
+
+def render_thumbnails(boards: List[tuple], size: int = THUMBNAIL_SIZE, theme: str = "default",
+                      paths: List[str] = None, processes: int = None, smooth: bool = True) -> list:
+    # boards: (masks, side_length) pairs. Returns the Surfaces, or writes the
+    # PNG files when paths are given and returns the paths.
+    tasks = [(bytes(masks), side_length, size, smooth, None if paths is None else paths[n])
+             for n, (masks, side_length) in enumerate(boards)]
+    if processes == 1:
+        thumbnail_worker_init(theme)
+        results = list(map(render_thumbnail_task, tasks))
+    else:
+        with Pool(processes, thumbnail_worker_init, (theme,)) as pool:
+            chunk_size = max(1, len(tasks) // ((processes or cpu_count()) * 4))
+            results = pool.map(render_thumbnail_task, tasks, chunk_size)
+    if paths is not None:
+        return results
+    return [pygame.image.frombytes(data, (size, size), "RGB") for data in results]
 
 # --- Helper Functions --- #
 def input_is_valid(given_input: str, bounds: Tuple[int]) -> str:
@@ -338,75 +1273,22 @@ def time_formatter(time: float) -> str:
 def main():
     pygame.init()
     
-    # --- Main Grid Generator Function --- #
-    def get_tubulation(side_length: int) -> Matrix:
-        center_node_pos = (side_length // 2, side_length // 2)
-        matrix = []
-        for row in range(side_length):
-            aux = []
-            for col in range(side_length):
-                if (row, col) != center_node_pos:
-                    tp = 4
-                    rot = 0
-                    if row == 0 or row == side_length - 1:
-                        tp -= 1
-                    if col == 0 or col == side_length - 1:
-                        tp -= 1
-                    if row == 0 and 0 <= col < side_length - 1:
-                        rot = 1
-                    elif col == side_length - 1 and 0 <= row < side_length - 1:
-                        rot = 2
-                    elif row == side_length - 1 and 0 < col < side_length:
-                        rot = 3
-                    aux.append(Node((col, row), rot, tp, images_resized))
-                else: 
-                    aux.append(Node(center_node_pos, 0, 9, images_resized))
-            matrix.append(aux)
-        for _ in matrix:
-            for i in _:
-                i.def_surrounding_nodes(matrix)
-        horizontal_edges = [((i, j), (i, j + 1)) for i in range(side_length) for j in range(side_length - 1)]
-        vertical_edges = [((i, j), (i + 1, j)) for i in range(side_length - 1) for j in range(side_length)]
-        edges = horizontal_edges + vertical_edges
-        edges_total_len = len(edges)
-        exited = False
-        while loops_exist(matrix, images_resized):
-            while everything_is_connected(matrix, images_resized):
-                edge = choice(edges)
-                pos1, pos2 = edge
-                direction = (pos1[0] - pos2[0], pos1[1] - pos2[1])
-                node1 = matrix[pos1[1]][pos1[0]]
-                node2 = matrix[pos2[1]][pos2[0]]
-                if direction == (0, -1):
-                    node1.down = False
-                    node2.up = False
-                elif direction == (-1, 0):
-                    node1.right = False
-                    node2.left = False
-                edges.remove(edge)
-                
-                # Loading Bar
-                curr_l = edges_total_len - len(edges)
-                l = (loading_bar_rect["width"] * curr_l) // edges_total_len
-                new_rect = pygame.Rect((SCREEN_SIZE[0] - loading_bar_rect["width"]) // 2, SCREEN_SIZE[1] // 16 * 13,
-                                        l, loading_bar_rect["height"])
-                pygame.draw.rect(screen, loading_bar_color, new_rect)
-                pygame.display.flip()
-                
-                exited = True
-            if exited:
-                exited = False
-                if direction == (0, -1):
-                    node1.down = True
-                    node2.up = True
-                elif direction == (-1, 0):
-                    node1.right = True
-                    node2.left = True
-        for _ in matrix:
-            for i in _:
-                i.def_type_rot_image(images_resized)
-        
-        return matrix
+    # --- Loading Bar --- #
+    def draw_loading_bar(curr_l: int, total_l: int):
+        l = (loading_bar_rect["width"] * curr_l) // total_l
+        new_rect = pygame.Rect((SCREEN_SIZE[0] - loading_bar_rect["width"]) // 2, SCREEN_SIZE[1] // 16 * 13,
+                                l, loading_bar_rect["height"])
+        pygame.draw.rect(screen, loading_bar_color, new_rect)
+        pygame.display.flip()
+    
+    def autosave_info() -> dict:
+        return {"size": ipt,
+                "elapsed": perf_counter() - start_time,
+                "language": language,
+                "theme": curr_images_theme,
+                "timer_back": is_timer_back,
+                "grid": is_grid_on,
+                "unique": is_unique_on}
     
     # --- Screen Size, Colors and Grid Bounds --- #
     SCREEN_SIZE = (800, 600) # Scalable
@@ -427,25 +1309,7 @@ def main():
     images_side_length = 360
     grid_size_bounds = (4, 25)
     
-    image_color_themes = {"default": ((100,180,230), # Light Blue (Water)
-                                      (60,60,150), # Dark blue (Center Node)
-                                      (80,160,200)), # Receiver Node
-                          "red": ((170,15,15),
-                                  (100, 5, 5),
-                                  (170,60,60)),
-                          "green": ((15,170,15),
-                                    (5, 90, 5),
-                                    (70,190,70)),
-                          "yellow": ((200,200,20),
-                                     (160,160,0),
-                                     (240,240,70)),
-                          "white": ((220,220,220),
-                                    (180,180,180),
-                                    (255,255,255)),
-                          "black": ((30,30,30),
-                                    (0,0,0),
-                                    (55,55,55))
-                          }
+    image_color_themes = IMAGE_COLOR_THEMES
     
     # --- Language Constants --- #
     language = "english"
@@ -460,7 +1324,11 @@ def main():
                "language": "Language[L]:",
                "timer": "Timer[T]:",
                "grid": "Grid[G]:",
-               "settings": "Press S for Settings."}
+               "unique": "Unique[U]:",
+               "on": "ON",
+               "off": "OFF",
+               "settings": "Press S for Settings.",
+               "resume": "Press R to Resume the last game."}
     portuguese = {"OutOfRange": "[ERRO] O número que digitou está fora do intervalo.",
                   "Length":"[ERRO] Nenhum input foi dado.",
                   "info":f"Tamanho deverá estar entre {grid_size_bounds[0]} e {grid_size_bounds[1]}.",
@@ -472,7 +1340,11 @@ def main():
                   "language": "Idioma[L]:",
                   "timer": "Cronómetro[T]:",
                   "grid": "Grelha[G]:",
-                  "settings": "Clique em S para as Configurações."}
+                  "unique": "Única[U]:",
+                  "on": "SIM",
+                  "off": "NÃO",
+                  "settings": "Clique em S para as Configurações.",
+                  "resume": "Clique em R para Retomar o último jogo."}
     languages = {"english": english,
                  "portuguese": portuguese}
     
@@ -510,6 +1382,8 @@ def main():
     settings_hint_color = colors["passive"]
     settings_hint_font = pygame.font.Font(None, SCREEN_SIZE[1] // 16)
     
+    resume_hint_text = languages[language]["resume"]
+    
     credits_text =  languages[language]["credits"]
     credits_color = colors["passive"]
     credits_font = pygame.font.Font(None, SCREEN_SIZE[1] // 12)
@@ -540,6 +1414,7 @@ def main():
     
     grid_back_alpha = 150
     is_grid_on = True
+    is_unique_on = False
     antialias = True
     
     # Settings Screen Variables
@@ -554,6 +1429,7 @@ def main():
     settings_language_text = languages[language]["language"]
     settings_timer_text = languages[language]["timer"]
     settings_grid_text = languages[language]["grid"]
+    settings_unique_text = languages[language]["unique"]
     
     settings_font = pygame.font.Font(None, SCREEN_SIZE[1] // 8)
     settings_color = colors["white"]
@@ -564,13 +1440,32 @@ def main():
     victory = False
     curr_images_theme = "default"
     themes_map = list(image_color_themes.keys())
+    curr_grid_layer_key = None
+    curr_settings_layer_key = None
+    curr_texts_language = language
+    
+    # Autosave Variables
+    autosaver = Autosaver()
+    autosave_exists = os.path.exists(AUTOSAVE_PATH)
+    
+    # Idle Scheduling Variables
+    clock = pygame.time.Clock()
+    frame_rate_cap = 60
+    waited_events = []
+    water_propagation = None
+    water_victory_time = None
     
     # --- Game Loop --- #
     while running:
         # --- Input Management --- #
-        for ev in pygame.event.get():
+        water_restart = False
+        events = waited_events + pygame.event.get()
+        waited_events = []
+        for ev in events:
             if ev.type == pygame.QUIT:
                 running = False
+                if curr_screen == "game" and not victory:
+                    autosaver.save(board_snapshot(game_matrix), autosave_info())
                 continue
             if curr_screen == "starting":
                 # --- Starting Screen Inputs --- #
@@ -581,67 +1476,31 @@ def main():
                         else:
                             textbox_is_active = False
                 elif ev.type == pygame.KEYDOWN:
+                    new_game = None
                     if ev.key == pygame.K_s:
                         curr_screen = "settings"
+                    elif ev.key == pygame.K_r and autosave_exists:
+                        try:
+                            saved_info, saved_board = load_game(AUTOSAVE_PATH, languages, grid_size_bounds)
+                        except (OSError, ValueError):
+                            autosave_exists = False
+                        else:
+                            new_game = "resume"
+                            ipt = saved_info["size"]
+                            language = saved_info["language"]
+                            change_theme(curr_images_theme, saved_info["theme"], images, image_color_themes)
+                            curr_images_theme = saved_info["theme"]
+                            is_timer_back = saved_info["timer_back"]
+                            is_grid_on = saved_info["grid"]
+                            is_unique_on = saved_info["unique"]
                     if textbox_is_active:
                         if ev.key == pygame.K_BACKSPACE:
                             textbox_text = textbox_text[:-1]
                         elif ev.key == pygame.K_RETURN:
                             input_check = input_is_valid(textbox_text, grid_size_bounds)
                             if input_check == "Clear":
-                                if is_timer_back:
-                                    # Timer Back
-                                    grid_size = min(SCREEN_SIZE[0], SCREEN_SIZE[1])
-                                    if SCREEN_SIZE[0] <= SCREEN_SIZE[1]:
-                                        grid_origin = (0, (SCREEN_SIZE[1] - SCREEN_SIZE[0]) // 2)
-                                    else:
-                                        grid_origin = ((SCREEN_SIZE[0] - SCREEN_SIZE[1]) // 2, 0)
-                                else:
-                                    # Timer Up
-                                    h = SCREEN_SIZE[1] - timer_up_space
-                                    grid_size = min(SCREEN_SIZE[0], h)
-                                    if SCREEN_SIZE[0] <= h:
-                                        grid_origin = (0, (h - SCREEN_SIZE[0]) // 2 + timer_up_space)
-                                    else:
-                                        grid_origin = ((SCREEN_SIZE[0] - h) // 2, timer_up_space)
-                                
                                 ipt = int(textbox_text)
-                                curr_screen = "game"
-                                error_text = ""
-                                
-                                images_side_length = grid_size // ipt
-                                aux = images_side_length % 3
-                                images_side_length -= aux
-                                difference = grid_size % ipt + aux * ipt
-                                grid_size -= difference
-                                grid_origin = (grid_origin[0] + difference // 2, grid_origin[1] + difference // 2)
-                                grid_back_rect_screen = pygame.Surface((grid_size, grid_size))
-                                grid_back_rect_screen.set_alpha(grid_back_alpha)
-                                curr_back_color = colors["grid_back"]
-                                
-                                images_resized = resize_images(images_side_length, images)
-                                
-                                # --- Loading Screen --- #
-                                screen.fill(background_color)
-                                
-                                # Size Text
-                                loading_size_surface = loading_size_font.render(languages[language]["size"] + str(ipt), antialias, loading_color)
-                                screen.blit(loading_size_surface, ((SCREEN_SIZE[0] - loading_size_surface.get_width()) // 2,
-                                                                   (SCREEN_SIZE[1] - loading_size_surface.get_width()) // 4))
-                                
-                                # Loading Text
-                                loading_surface = loading_font.render(loading_text, antialias, loading_color)
-                                screen.blit(loading_surface, ((SCREEN_SIZE[0] - loading_surface.get_width()) // 2,
-                                                              (SCREEN_SIZE[1] - loading_surface.get_height()) // 8 * 3))
-                                pygame.display.flip()
-                                
-                                # loading_start_time = perf_counter()
-                                game_matrix = get_tubulation(ipt)
-                                # print(f"Loading Time ({ipt}):", time_formatter(perf_counter() - loading_start_time))
-                                
-                                scrabble_matrix(game_matrix)
-                                check_connection(game_matrix, images_resized)
-                                start_time = perf_counter()
+                                new_game = "new"
                             else:
                                 error_text = languages[language][input_check]
                                 textbox_text = ""
@@ -649,9 +1508,82 @@ def main():
                             char = ev.unicode
                             if char.isnumeric():
                                 textbox_text += char
+                    if new_game:
+                        if is_timer_back:
+                            # Timer Back
+                            grid_size = min(SCREEN_SIZE[0], SCREEN_SIZE[1])
+                            if SCREEN_SIZE[0] <= SCREEN_SIZE[1]:
+                                grid_origin = (0, (SCREEN_SIZE[1] - SCREEN_SIZE[0]) // 2)
+                            else:
+                                grid_origin = ((SCREEN_SIZE[0] - SCREEN_SIZE[1]) // 2, 0)
+                        else:
+                            # Timer Up
+                            h = SCREEN_SIZE[1] - timer_up_space
+                            grid_size = min(SCREEN_SIZE[0], h)
+                            if SCREEN_SIZE[0] <= h:
+                                grid_origin = (0, (h - SCREEN_SIZE[0]) // 2 + timer_up_space)
+                            else:
+                                grid_origin = ((SCREEN_SIZE[0] - h) // 2, timer_up_space)
+                        
+                        curr_screen = "game"
+                        error_text = ""
+                        
+                        images_side_length = grid_size // ipt
+                        aux = images_side_length % 3
+                        images_side_length -= aux
+                        difference = grid_size % ipt + aux * ipt
+                        grid_size -= difference
+                        grid_origin = (grid_origin[0] + difference // 2, grid_origin[1] + difference // 2)
+                        curr_back_color = colors["grid_back"]
+                        
+                        images_resized = resize_images(images_side_length, images)
+                        
+                        if new_game == "resume":
+                            game_matrix = nodes_from_save(saved_board, ipt, images_resized)
+                        else:
+                            # --- Loading Screen --- #
+                            screen.fill(background_color)
+                            
+                            # Size Text
+                            loading_size_surface = loading_size_font.render(languages[language]["size"] + str(ipt), antialias, loading_color)
+                            screen.blit(loading_size_surface, ((SCREEN_SIZE[0] - loading_size_surface.get_width()) // 2,
+                                                               (SCREEN_SIZE[1] - loading_size_surface.get_width()) // 4))
+                            
+                            # Loading Text
+                            loading_surface = loading_font.render(loading_text, antialias, loading_color)
+                            screen.blit(loading_surface, ((SCREEN_SIZE[0] - loading_surface.get_width()) // 2,
+                                                          (SCREEN_SIZE[1] - loading_surface.get_height()) // 8 * 3))
+                            pygame.display.flip()
+                            
+                            # loading_start_time = perf_counter()
+                            if is_unique_on:
+                                game_matrix = get_unique_tubulation(ipt, images_resized, draw_loading_bar)
+                            else:
+                                game_matrix = get_tubulation(ipt, images_resized, draw_loading_bar)
+                            # print(f"Loading Time ({ipt}):", time_formatter(perf_counter() - loading_start_time))
+                            
+                            scrabble_matrix(game_matrix)
+                        check_connection(game_matrix, images_resized)
+                        open_ends_total = count_open_ends(game_matrix)
+                        journal = MoveJournal(game_matrix)
+                        water_propagation = None
+                        water_victory_time = None
+                        if new_game == "resume":
+                            start_time = perf_counter() - saved_info["elapsed"]
+                        else:
+                            start_time = perf_counter()
+                        autosaver.save(board_snapshot(game_matrix), autosave_info())
+                        autosave_exists = True
             elif curr_screen == "game":
                 # --- Game Screen Inputs --- #
+                if not victory and water_victory_time is not None and ev.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+                    # The board may be complete, the next inputs (moves and leaving
+                    # the game) wait for the water
+                    waited_events.append(ev)
+                    continue
                 if not victory:
+                    curr_node = None
+                    board_changed = False
                     if ev.type == pygame.MOUSEBUTTONDOWN:
                         if ev.button in (1, 3):
                             mouse_click = ev.pos
@@ -660,18 +1592,42 @@ def main():
                                 mat_coords = ((mouse_click[0] - grid_origin[0]) // images_side_length,
                                               (mouse_click[1] - grid_origin[1]) // images_side_length,)
                                 curr_node = game_matrix[mat_coords[1]][mat_coords[0]]
-                                edges, victory = curr_node.click(game_matrix, clockwise, images_resized)
-                                if loops_exist(game_matrix, images_resized):
-                                    curr_back_color = colors["grid_back_loop"]
-                                else:
-                                    curr_back_color = colors["grid_back"]
-                                if victory:
-                                    victory_text = languages[language]["victory"]
-                                    victory_timer_text = time_formatter(perf_counter() - start_time)
+                    elif ev.type == pygame.KEYDOWN:
+                        if ev.key in (pygame.K_z, pygame.K_y):
+                            # Undo / Redo
+                            move = journal.undo() if ev.key == pygame.K_z else journal.redo()
+                            if move is not None:
+                                mat_coords, clockwise = move
+                                curr_node = game_matrix[mat_coords[1]][mat_coords[0]]
+                        elif ev.key in (pygame.K_HOME, pygame.K_END):
+                            # Jump to the start / end of the history
+                            journal.jump(game_matrix, 0 if ev.key == pygame.K_HOME else len(journal.moves))
+                            open_ends_total = count_open_ends(game_matrix)
+                            board_changed = True
+                    if curr_node is not None:
+                        # Rotations are applied right away, the water is only
+                        # checked once all the inputs of this frame are read
+                        open_ends_total -= local_open_ends(curr_node)
+                        curr_node.rotate(clockwise)
+                        open_ends_total += local_open_ends(curr_node)
+                        if ev.type == pygame.MOUSEBUTTONDOWN:
+                            journal.record(game_matrix, curr_node.pos, clockwise)
+                        board_changed = True
+                    if board_changed:
+                        water_restart = True
+                        if not open_ends_total:
+                            water_victory_time = perf_counter()
+                        else:
+                            water_victory_time = None
                 if ev.type == pygame.KEYDOWN :
                     if (ev.key == pygame.K_RETURN and victory) or ev.key == pygame.K_ESCAPE:
+                        if not victory:
+                            autosaver.save(board_snapshot(game_matrix), autosave_info())
                         curr_screen = "starting"
                         victory = False
+                        water_restart = False
+                        water_propagation = None
+                        water_victory_time = None
                         victory_text = ""
                         victory_timer_text = ""
                         timer_text = "00:00"
@@ -686,14 +1642,6 @@ def main():
                             language = "english"
                         elif language == "english":
                             language = "portuguese"
-                        info_text = languages[language]["info"]
-                        settings_hint_text = languages[language]["settings"]
-                        credits_text =  languages[language]["credits"]
-                        loading_text = languages[language]["loading"]
-                        settings_color_text = languages[language]["color"]
-                        settings_language_text = languages[language]["language"]
-                        settings_timer_text = languages[language]["timer"]
-                        settings_grid_text = languages[language]["grid"]
                     elif ev.key == pygame.K_c:
                         i = themes_map.index(curr_images_theme)
                         i = (i + 1) % len(themes_map)
@@ -702,6 +1650,8 @@ def main():
                         curr_images_theme = aux
                     elif ev.key == pygame.K_g:
                         is_grid_on = not is_grid_on
+                    elif ev.key == pygame.K_u:
+                        is_unique_on = not is_unique_on
             if ev.type == pygame.VIDEORESIZE:
                 SCREEN_SIZE = pygame.display.get_window_size()
                 textbox_size = (SCREEN_SIZE[0] // 8, SCREEN_SIZE[1] // 8)
@@ -750,13 +1700,14 @@ def main():
                     difference = grid_size % ipt + aux * ipt
                     grid_size -= difference
                     grid_origin = (grid_origin[0] + difference // 2, grid_origin[1] + difference // 2)
-                    grid_back_rect_screen = pygame.Surface((grid_size, grid_size))
-                    grid_back_rect_screen.set_alpha(grid_back_alpha)
                     
                     images_resized = resize_images(images_side_length, images)
                     for _ in game_matrix:
                         for i in _:
                             i.update_image(images_resized)
+                    if water_propagation is not None:
+                        # The pending water would keep using the old sprites
+                        water_propagation = propagate_water(game_matrix, images_resized)
                     
                 settings_icons_size = SCREEN_SIZE[1] // 6
                 flags_resized = resize_icons(settings_icons_size, FLAGS)
@@ -764,6 +1715,45 @@ def main():
                 
                 
         
+        # --- Texts --- #
+        # The language changes in the settings and when a game is resumed
+        if language != curr_texts_language:
+            curr_texts_language = language
+            info_text = languages[language]["info"]
+            settings_hint_text = languages[language]["settings"]
+            resume_hint_text = languages[language]["resume"]
+            credits_text =  languages[language]["credits"]
+            loading_text = languages[language]["loading"]
+            settings_color_text = languages[language]["color"]
+            settings_language_text = languages[language]["language"]
+            settings_timer_text = languages[language]["timer"]
+            settings_grid_text = languages[language]["grid"]
+            settings_unique_text = languages[language]["unique"]
+        
+        # --- Autosave --- #
+        # Written on the autosaver thread, a finished game has nothing to resume
+        if water_restart:
+            autosaver.save(board_snapshot(game_matrix), autosave_info())
+        
+        # --- Water Check --- #
+        # A newer move restarts the water, victory is only checked once it stops
+        if water_restart:
+            water_propagation = propagate_water(game_matrix, images_resized)
+        if water_propagation is not None and run_water_propagation(water_propagation):
+            water_propagation = None
+            if water_loops_exist(game_matrix):
+                curr_back_color = colors["grid_back_loop"]
+            else:
+                curr_back_color = colors["grid_back"]
+            if water_victory_time is not None:
+                victory = check_victory(game_matrix)
+                if victory:
+                    victory_text = languages[language]["victory"]
+                    victory_timer_text = time_formatter(water_victory_time - start_time)
+                    autosaver.clear()
+                    autosave_exists = False
+                water_victory_time = None
+        
         # --- Display Screen --- #
         screen.fill(background_color)
         
@@ -805,6 +1795,11 @@ def main():
             settings_hint_surface = settings_hint_font.render(settings_hint_text, antialias, settings_hint_color)
             screen.blit(settings_hint_surface, ((SCREEN_SIZE [0] - settings_hint_surface.get_width()) // 2, SCREEN_SIZE[1] // 4 * 3))
             
+            # Resume Hint
+            if autosave_exists:
+                resume_hint_surface = settings_hint_font.render(resume_hint_text, antialias, settings_hint_color)
+                screen.blit(resume_hint_surface, ((SCREEN_SIZE [0] - resume_hint_surface.get_width()) // 2, SCREEN_SIZE[1] // 16 * 13))
+            
             # Credits
             credits_surface = credits_font.render(credits_text, antialias, credits_color)
             screen.blit(credits_surface, ((SCREEN_SIZE[0] - credits_surface.get_width()) // 2,
@@ -828,16 +1823,13 @@ def main():
                 screen.blit(timer_surface, ((SCREEN_SIZE[0] - timer_surface.get_width()) // 2,
                                             (timer_up_space - timer_surface.get_height()) // 2))
             
-            # Grid Background
-            grid_back_rect_screen.fill(curr_back_color)
-            screen.blit(grid_back_rect_screen, grid_origin)
-            
-            # Grid
-            if is_grid_on:
-                for x in range(grid_origin[0], grid_origin[0] + grid_size + 1, images_side_length):
-                    pygame.draw.line(screen, colors["grid_lines"], (x, grid_origin[1]), (x, grid_origin[1] + grid_size))
-                for y in range(grid_origin[1], grid_origin[1] + grid_size + 1, images_side_length):
-                    pygame.draw.line(screen, colors["grid_lines"], (grid_origin[0], y), (grid_origin[0] + grid_size, y))
+            # Grid Background & Grid
+            grid_layer_key = (grid_size, images_side_length, curr_back_color, is_grid_on)
+            if grid_layer_key != curr_grid_layer_key:
+                grid_layer = render_grid_layer(grid_size, images_side_length, curr_back_color, grid_back_alpha,
+                                               colors["grid_lines"], is_grid_on)
+                curr_grid_layer_key = grid_layer_key
+            screen.blit(grid_layer, grid_origin)
             
             # Display Game Matrix
             for row in game_matrix:
@@ -860,51 +1852,70 @@ def main():
         elif curr_screen == "settings":
             # --- Settings Screen --- #
             
-            options = 5 # +1
-            l_cen = SCREEN_SIZE[0] // 6 * 2
-            r_cen = l_cen // 2 * 5
-            
-            # Color Setting
-            color_surface = settings_font.render(settings_color_text, antialias, settings_color)
-            screen.blit(color_surface, (l_cen - color_surface.get_width() // 2,
-                                        SCREEN_SIZE[1] // options - color_surface.get_height() // 2))
-            
-            pygame.draw.rect(screen, image_color_themes[curr_images_theme][0],
-                             pygame.Rect(r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options - settings_icons_size // 3,
-                                         settings_icons_size, settings_icons_size // 3 * 2),
-                             border_radius = SCREEN_SIZE[1] // 80)
-            
-            # Language Setting
-            language_surface = settings_font.render(settings_language_text, antialias, settings_color)
-            screen.blit(language_surface, (l_cen - language_surface.get_width() // 2,
-                                           SCREEN_SIZE[1] // options * 2 - language_surface.get_height() // 2))
-            
-            curr_flag = flags_resized[language]
-            screen.blit(curr_flag, (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 2 - settings_icons_size // 2))
-            
-            # Timer Setting
-            settings_timer_surface = settings_font.render(settings_timer_text, antialias, settings_color)
-            screen.blit(settings_timer_surface, (l_cen - settings_timer_surface.get_width() // 2,
-                                                 SCREEN_SIZE[1] // options * 3 - settings_timer_surface.get_height() // 2)) 
-            
-            timer_setting = "behind" if is_timer_back else "top"
-            timer_icon = timer_icons_resized[timer_setting]
-            screen.blit(timer_icon, (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 3 - settings_icons_size // 2))
-            
-            # Grid Setting
-            settings_grid_surface = settings_font.render(settings_grid_text, antialias, settings_color)
-            screen.blit(settings_grid_surface, (l_cen - settings_grid_surface.get_width() // 2,
-                                                SCREEN_SIZE[1] // options * 4 - settings_grid_surface.get_height() // 2))
-            
-            grid_icon_pos = (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 4 - settings_icons_size // 2)
-            pygame.draw.rect(screen, colors["grid_back_solid"], pygame.Rect(grid_icon_pos,(settings_icons_size, settings_icons_size)))
-            if is_grid_on:
-                grid_icon_end = (grid_icon_pos[0] + settings_icons_size, grid_icon_pos[1] + settings_icons_size)
-                grid_icon_step = settings_icons_size // 4
-                for x in range(grid_icon_pos[0], grid_icon_end[0] + 1, grid_icon_step):
-                    pygame.draw.line(screen, colors["grid_lines"], (x, grid_icon_pos[1]), (x, grid_icon_pos[1] + settings_icons_size))
-                for y in range(grid_icon_pos[1], grid_icon_end[1] + 1, grid_icon_step):
-                    pygame.draw.line(screen, colors["grid_lines"], (grid_icon_pos[0], y), (grid_icon_pos[0] + settings_icons_size, y))
+            # Rebuilt only when something shown on it changes
+            settings_layer_key = (SCREEN_SIZE, language, curr_images_theme, is_timer_back, is_grid_on, is_unique_on)
+            if settings_layer_key != curr_settings_layer_key:
+                settings_layer = pygame.Surface(SCREEN_SIZE)
+                settings_layer.fill(background_color)
+                
+                options = 6 # +1
+                l_cen = SCREEN_SIZE[0] // 6 * 2
+                r_cen = l_cen // 2 * 5
+                
+                # Color Setting
+                color_surface = settings_font.render(settings_color_text, antialias, settings_color)
+                settings_layer.blit(color_surface, (l_cen - color_surface.get_width() // 2,
+                                                    SCREEN_SIZE[1] // options - color_surface.get_height() // 2))
+                
+                pygame.draw.rect(settings_layer, image_color_themes[curr_images_theme][0],
+                                 pygame.Rect(r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options - settings_icons_size // 3,
+                                             settings_icons_size, settings_icons_size // 3 * 2),
+                                 border_radius = SCREEN_SIZE[1] // 80)
+                
+                # Language Setting
+                language_surface = settings_font.render(settings_language_text, antialias, settings_color)
+                settings_layer.blit(language_surface, (l_cen - language_surface.get_width() // 2,
+                                                       SCREEN_SIZE[1] // options * 2 - language_surface.get_height() // 2))
+                
+                curr_flag = flags_resized[language]
+                settings_layer.blit(curr_flag, (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 2 - settings_icons_size // 2))
+                
+                # Timer Setting
+                settings_timer_surface = settings_font.render(settings_timer_text, antialias, settings_color)
+                settings_layer.blit(settings_timer_surface, (l_cen - settings_timer_surface.get_width() // 2,
+                                                             SCREEN_SIZE[1] // options * 3 - settings_timer_surface.get_height() // 2)) 
+                
+                timer_setting = "behind" if is_timer_back else "top"
+                timer_icon = timer_icons_resized[timer_setting]
+                settings_layer.blit(timer_icon, (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 3 - settings_icons_size // 2))
+                
+                # Grid Setting
+                settings_grid_surface = settings_font.render(settings_grid_text, antialias, settings_color)
+                settings_layer.blit(settings_grid_surface, (l_cen - settings_grid_surface.get_width() // 2,
+                                                            SCREEN_SIZE[1] // options * 4 - settings_grid_surface.get_height() // 2))
+                
+                grid_icon_pos = (r_cen - settings_icons_size // 2, SCREEN_SIZE[1] // options * 4 - settings_icons_size // 2)
+                pygame.draw.rect(settings_layer, colors["grid_back_solid"], pygame.Rect(grid_icon_pos,(settings_icons_size, settings_icons_size)))
+                if is_grid_on:
+                    grid_icon_end = (grid_icon_pos[0] + settings_icons_size, grid_icon_pos[1] + settings_icons_size)
+                    grid_icon_step = settings_icons_size // 4
+                    for x in range(grid_icon_pos[0], grid_icon_end[0] + 1, grid_icon_step):
+                        pygame.draw.line(settings_layer, colors["grid_lines"], (x, grid_icon_pos[1]), (x, grid_icon_pos[1] + settings_icons_size))
+                    for y in range(grid_icon_pos[1], grid_icon_end[1] + 1, grid_icon_step):
+                        pygame.draw.line(settings_layer, colors["grid_lines"], (grid_icon_pos[0], y), (grid_icon_pos[0] + settings_icons_size, y))
+                
+                # Unique Setting
+                settings_unique_surface = settings_font.render(settings_unique_text, antialias, settings_color)
+                settings_layer.blit(settings_unique_surface, (l_cen - settings_unique_surface.get_width() // 2,
+                                                              SCREEN_SIZE[1] // options * 5 - settings_unique_surface.get_height() // 2))
+                
+                unique_state_text = languages[language]["on"] if is_unique_on else languages[language]["off"]
+                unique_state_surface = settings_font.render(unique_state_text, antialias, settings_color)
+                settings_layer.blit(unique_state_surface, (r_cen - unique_state_surface.get_width() // 2,
+                                                           SCREEN_SIZE[1] // options * 5 - unique_state_surface.get_height() // 2))
+                
+                curr_settings_layer_key = settings_layer_key
+            screen.blit(settings_layer, (0, 0))
         
         # Center Check
         # pygame.draw.line(screen, (0, 0, 0), (SCREEN_SIZE[0] // 2, 0), (SCREEN_SIZE[0] // 2, SCREEN_SIZE[1]))
@@ -912,8 +1923,93 @@ def main():
         
         # Refresh Screen
         pygame.display.flip()
+        
+        # --- Idle Scheduling --- #
+        # Nothing changes on screen without an input, except the game timer once
+        # per second, so wait for the next event or the next second of the timer.
+        # The event that ends the wait is handled first on the next frame.
+        if running and water_propagation is None and not waited_events and not pygame.event.peek():
+            if curr_screen == "game" and not victory:
+                elapsed = perf_counter() - start_time
+                timeout = max(1, ceil((int(elapsed) + 1 - elapsed) * 1000))
+                ev = pygame.event.wait(timeout)
+            else:
+                ev = pygame.event.wait()
+            if ev.type != pygame.NOEVENT:
+                waited_events.append(ev)
+        clock.tick(frame_rate_cap)
     
+    autosaver.close()
     pygame.quit()
 
+# --- Benchmarks --- #
+# Run with "python pipes-pygame.py --benchmark <name>"
+def benchmark_generators(sizes: Tuple[int] = (4, 8, 12, 16, 20, 25), repeats: int = 3):
+    images_resized = resize_images(12, get_images())
+    for size in sizes:
+        for name, generator in (("random", get_tubulation), ("unique", get_unique_tubulation)):
+            start = perf_counter()
+            for _ in range(repeats):
+                generator(size, images_resized)
+            elapsed = perf_counter() - start
+            print(f"{name:>8} {size:>4}x{size:<4} {repeats / elapsed:10.2f} boards/s")
+
+def benchmark_tiled_generation(side_length: int = 2000, repeats: int = 1):
+    processes = 1
+    while processes <= cpu_count():
+        start = perf_counter()
+        for _ in range(repeats):
+            tiled_tubulation_masks(side_length, processes)
+        elapsed = (perf_counter() - start) / repeats
+        print(f"{processes:>3} processes {side_length:>5}x{side_length:<5} {elapsed:8.2f} s/board "
+              f"{side_length ** 2 / elapsed:12.0f} nodes/s")
+        processes *= 2
+
+def benchmark_mapped_boards(sizes: Tuple[int] = (500, 1000, 2000, 4000)):
+    import resource # Not available on Windows
+    path = os.path.join(gettempdir(), "benchmark.pipes")
+    for size in sizes:
+        start = perf_counter()
+        generate_mapped_board(path, size).close()
+        generation_time = perf_counter() - start
+        start = perf_counter()
+        board = MappedBoard(path)
+        open_time = perf_counter() - start
+        start = perf_counter()
+        mapped_check_connection(board)
+        check_time = perf_counter() - start
+        board.close()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        print(f"{size:>5}x{size:<5} generate {generation_time:7.2f} s  open {open_time * 1000:6.2f} ms  "
+              f"check_connection {check_time:7.2f} s  peak memory {peak:5d} MB")
+    os.remove(path)
+
+def benchmark_thumbnails(n_boards: int = 256, side_length: int = 10, sizes: Tuple[int] = (64, 128, 256)):
+    boards = [([rotate_mask(mask, randint(0, 3)) for mask in random_tree_masks(side_length)], side_length)
+              for _ in range(n_boards)]
+    folder = gettempdir()
+    for size in sizes:
+        processes = 1
+        while processes <= cpu_count():
+            for output in ("surfaces", "png"):
+                paths = None
+                if output == "png":
+                    paths = [os.path.join(folder, f"thumbnail_{n}.png") for n in range(n_boards)]
+                start = perf_counter()
+                render_thumbnails(boards, size, paths = paths, processes = processes)
+                elapsed = perf_counter() - start
+                print(f"{processes:>3} processes {size:>4}px {output:>8} {n_boards / elapsed:10.1f} thumbnails/s")
+            processes *= 2
+    for n in range(n_boards):
+        os.remove(os.path.join(folder, f"thumbnail_{n}.png"))
+
+BENCHMARKS = {"generation": benchmark_generators,
+              "tiled": benchmark_tiled_generation,
+              "mapped": benchmark_mapped_boards,
+              "thumbnails": benchmark_thumbnails}
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 2 and sys.argv[1] == "--benchmark":
+        BENCHMARKS[sys.argv[2]]()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Batched environment of the game pipes for automated players.
+
+Steps N boards at once as NumPy arrays and does not need pygame.
+The rotation, water and loop rules are the ones of pipes-pygame.py
+(Node.click, check_connection, check_victory and loops_exist).
+"""
+
+import numpy as np
+from time import perf_counter
+
+# --- Board Encoding --- #
+# Every cell is stored as its connection mask, bit i is set when the cell
+# connects towards (up, right, down, left)[i], the same as in pipes-pygame.py.
+# The source node is always the center cell.
+#
+# Observation: uint8 array (N, 5, side_length, side_length) with one plane per
+# connection (up, right, down, left) and the water mask.
+# Action: "cell << 1 | clockwise" with "cell = y * side_length + x".
+
+UP, RIGHT, DOWN, LEFT = 1, 2, 4, 8
+
+def find_root(parent: list, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def random_tree_masks(side_length: int, rng: np.random.Generator) -> np.ndarray:
+    # Randomized Kruskal over the grid edges
+    n_cells = side_length ** 2
+    edges = [i << 1 for i in range(n_cells) if i % side_length < side_length - 1]
+    edges += [i << 1 | 1 for i in range(n_cells - side_length)]
+    parent = list(range(n_cells))
+    masks = np.zeros(n_cells, np.uint8)
+    for edge in rng.permutation(edges).tolist():
+        i = edge >> 1
+        if edge & 1:
+            j, bit_i, bit_j = i + side_length, DOWN, UP
+        else:
+            j, bit_i, bit_j = i + 1, RIGHT, LEFT
+        root_i, root_j = find_root(parent, i), find_root(parent, j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+            masks[i] |= bit_i
+            masks[j] |= bit_j
+    return masks.reshape(side_length, side_length)
+
+def rotate_masks(masks: np.ndarray, clockwise: np.ndarray) -> np.ndarray:
+    return np.where(clockwise, (masks << 1) | (masks >> 3), (masks >> 1) | (masks << 3)) & 15
+
+def open_connections(masks: np.ndarray) -> tuple:
+    # Connections matched on both sides (right of each cell, below each cell)
+    right = (masks[:, :, :-1] & RIGHT > 0) & (masks[:, :, 1:] & LEFT > 0)
+    down = (masks[:, :-1, :] & DOWN > 0) & (masks[:, 1:, :] & UP > 0)
+    return right, down
+
+def water_masks(masks: np.ndarray, right: np.ndarray, down: np.ndarray) -> np.ndarray:
+    # Same as check_connection: the water reaches every cell connected to the source
+    side_length = masks.shape[1]
+    water = np.zeros(masks.shape, bool)
+    water[:, side_length // 2, side_length // 2] = True
+    while True:
+        aux = water.copy()
+        aux[:, :, 1:] |= water[:, :, :-1] & right
+        aux[:, :, :-1] |= water[:, :, 1:] & right
+        aux[:, 1:, :] |= water[:, :-1, :] & down
+        aux[:, :-1, :] |= water[:, 1:, :] & down
+        if np.array_equal(aux, water):
+            return water
+        water = aux
+
+def loops_exist(water: np.ndarray, right: np.ndarray, down: np.ndarray) -> np.ndarray:
+    # The water of a board has a loop when it uses more connections than a tree
+    edges = (right & water[:, :, :-1]).sum((1, 2)) + (down & water[:, :-1, :]).sum((1, 2))
+    return edges > water.sum((1, 2)) - 1
+
+def check_victory(water: np.ndarray) -> np.ndarray:
+    return water.all((1, 2))
+
+class BatchedPipesEnv:
+    def __init__(self, n_boards: int, side_length: int, victory_reward: float = 1.0,
+                 loop_reward: float = -0.1, auto_reset: bool = True, seed: int = None):
+        self.n_boards = n_boards
+        self.side_length = side_length
+        self.victory_reward = victory_reward
+        self.loop_reward = loop_reward
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+        self.masks = np.zeros((n_boards, side_length, side_length), np.uint8)
+        self.water = np.zeros((n_boards, side_length, side_length), bool)
+
+    def new_boards(self, boards: np.ndarray):
+        # Random tree, scrambled like scrabble_matrix
+        for b in boards:
+            masks = random_tree_masks(self.side_length, self.rng)
+            rots = self.rng.integers(0, 4, masks.shape)
+            for rot in range(1, 4):
+                masks = np.where(rots >= rot, rotate_masks(masks, True), masks)
+            self.masks[b] = masks
+
+    def observation(self) -> np.ndarray:
+        aux = np.empty((self.n_boards, 5, self.side_length, self.side_length), np.uint8)
+        for i in range(4):
+            aux[:, i] = self.masks >> i & 1
+        aux[:, 4] = self.water
+        return aux
+
+    def evaluate(self) -> tuple:
+        right, down = open_connections(self.masks)
+        self.water = water_masks(self.masks, right, down)
+        return check_victory(self.water), loops_exist(self.water, right, down)
+
+    def reset(self, masks: np.ndarray = None) -> np.ndarray:
+        if masks is None:
+            self.new_boards(np.arange(self.n_boards))
+        else:
+            self.masks[:] = masks
+        self.evaluate()
+        return self.observation()
+
+    def step(self, actions: np.ndarray) -> tuple:
+        actions = np.asarray(actions)
+        boards = np.arange(self.n_boards)
+        y, x = np.divmod(actions >> 1, self.side_length)
+        self.masks[boards, y, x] = rotate_masks(self.masks[boards, y, x], actions & 1 > 0)
+        victory, loops = self.evaluate()
+        reward = np.where(victory, self.victory_reward, 0.0) + np.where(loops, self.loop_reward, 0.0)
+        info = {"victory": victory, "loops": loops}
+        if self.auto_reset and victory.any():
+            info["final_observation"] = self.observation()
+            finished = np.flatnonzero(victory)
+            self.new_boards(finished)
+            right, down = open_connections(self.masks[finished])
+            self.water[finished] = water_masks(self.masks[finished], right, down)
+        return self.observation(), reward, victory, info
+
+# --- Benchmark --- #
+def benchmark_env(batch_sizes: tuple = (1, 4, 16, 64, 256, 1024, 4096), side_length: int = 10, steps: int = 50):
+    for n_boards in batch_sizes:
+        env = BatchedPipesEnv(n_boards, side_length, seed = 0)
+        env.reset()
+        actions = env.rng.integers(0, 2 * side_length ** 2, (steps, n_boards))
+        start = perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        elapsed = perf_counter() - start
+        print(f"{n_boards:>5} boards {side_length:>3}x{side_length:<3} {steps * n_boards / elapsed:12.0f} env steps/s")
+
+if __name__ == "__main__":
+    benchmark_env()
\ No newline at end of file